@@ -0,0 +1,136 @@
+"""
+compare placement strategies on seeded samples of a classroom vocabulary,
+and what it costs to hand a large vocabulary to worker processes
+
+    python benchmark.py [--seed N] [--words N] [--widths 1 4 16] [--moves N]
+    python benchmark.py --workers N [--vocabulary N]
+"""
+
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from kreuzwort import Layout, PackedWordlist, Wordlist, compact, lay_out, score
+
+# what each worker process was handed in its initializer
+RECEIVED: list = []
+
+VOCABULARY = """
+    armchair backpack balloon banana bathroom bedroom bicycle birthday
+    blanket blackboard bookcase bottle breakfast brother butterfly
+    calendar candle cardboard carpet castle ceiling chair chicken chimney
+    computer cousin crayon cupboard curtain daughter dictionary dinosaur
+    dolphin doorbell dragon drawing elephant envelope eraser feather
+    fireman flower football fridge garden giraffe glasses grandfather
+    guitar hamster helmet holiday homework island jacket kitchen ladder
+    lemonade library lighthouse lunchbox magazine medicine monkey
+    mountain necklace notebook orange paintbrush pencil penguin picture
+    pillow pirate playground pocket potato puzzle rabbit rainbow rucksack
+    sandwich scissors schedule shoulder sister speaker spider station
+    sticker strawberry sunglasses supermarket sweater tablet teacher
+    telephone thunder tissue toothbrush tortoise trousers umbrella uncle
+    variety village vocabulary volcano wardrobe weather whistle window
+""".split()
+
+
+def measure(name: str, run) -> None:
+    """time a strategy and print the shape of the layout it produced"""
+    start = time.perf_counter()
+    layout: Layout = run()
+    seconds = time.perf_counter() - start
+    print(
+        f"{name:<10} {seconds * 1000:>9.1f} ms"
+        f" {len(layout.placed_words):>6} {len(layout.unplaced):>8}"
+        f" {layout.rows:>3}x{layout.columns:<3}"
+        f" {layout.crossings:>9} {score(layout):>7}"
+    )
+
+
+def receive(vocabulary) -> None:
+    RECEIVED.append(vocabulary)
+
+
+def attach(name: str) -> None:
+    RECEIVED.append(PackedWordlist.attach(name))
+
+
+def resident() -> int:
+    """memory the process currently holds in kB. The peak from getrusage
+    would include the parent's, as it survives the exec of a new worker"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def report(started: float) -> tuple[float, int]:
+    """seconds from starting the pool until this worker was ready, and
+    the memory the worker holds in kB"""
+    time.sleep(0.2)  # make sure every worker gets a task
+    return time.time() - started, resident()
+
+
+def workers(name: str, count: int, initializer, initargs) -> None:
+    """start a pool of spawned workers and show how long they took to
+    get ready and how much memory they use"""
+    started = time.time()
+    with ProcessPoolExecutor(
+        count,
+        multiprocessing.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs,
+    ) as executor:
+        results = list(executor.map(report, [started] * count))
+    ready = max(seconds for seconds, _ in results)
+    rss = sum(kilobytes for _, kilobytes in results) / count / 1024
+    print(f"{name:<10} {ready * 1000:>9.1f} ms {rss:>10.1f} MB")
+
+
+def compare_workers(count: int, size: int, seed: int) -> None:
+    """unpickling the whole wordlist in every worker against attaching
+    to a packed copy of it in shared memory"""
+    generator = random.Random(seed)
+    words = [
+        "".join(generator.sample(word, len(word)))
+        for word in generator.choices(VOCABULARY, k=size)
+    ]
+    wordlist = Wordlist(words)
+    print(f"{count} workers, {size} words\n")
+    print("handover        ready  rss/worker")
+    workers("pickled", count, receive, (wordlist,))
+    packed = PackedWordlist.pack(wordlist)
+    try:
+        workers("shared", count, attach, (packed.name,))
+    finally:
+        packed.unlink()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--words", type=int, default=20)
+    parser.add_argument("--widths", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--moves", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--vocabulary", type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.workers:
+        compare_workers(args.workers, args.vocabulary, args.seed)
+        return None
+
+    sample = random.Random(args.seed).sample(VOCABULARY, args.words)
+    print(f"{len(sample)} words, seed {args.seed}\n")
+    print("strategy        time placed unplaced    size crossings   score")
+    measure("greedy", lambda: lay_out(sample))
+    for width in args.widths:
+        measure(f"beam {width}", lambda: lay_out(sample, beam_width=width))
+    measure("annealed", lambda: compact(lay_out(sample), args.moves))
+
+
+if __name__ == "__main__":
+    main()
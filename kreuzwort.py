@@ -2,10 +2,40 @@
 Generate an arrowword puzzle from an unordered list of words (and definitions).
 """
 
-from typing import Iterator, List, Literal
+import csv
+import math
+import random
+import shutil
+import sys
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from heapq import heappop, heappush, nlargest
+from itertools import accumulate, groupby, islice, repeat
+from multiprocessing.shared_memory import SharedMemory
+from os import PathLike
+from typing import Callable, Iterable, Iterator, List, NamedTuple, TextIO
+from array import array
 from enum import Enum
 
 
+# how many cells of grid area a crossing or a free node is worth when
+# comparing partial layouts in beam_search
+CROSSING_WEIGHT = 10
+ANCHOR_WEIGHT = 2
+
+# spreadsheet entries are folded into plain lowercase letters with these,
+# so that "Fußball-Spiel" becomes "fussballspiel"
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+SEPARATORS = str.maketrans("", "", " -\t\u00a0")
+
+
+class PlacementError(Exception):
+    """raised when a word can't be attached to any of the placed words"""
+
+
 class Orientation(Enum):
     """this will be useful as a cursor of sorts,
     as well as enabling the growth of a grid by multiplying
@@ -21,18 +51,22 @@ class Orientation(Enum):
     ACROSS = (0, 1)
     DOWN = (1, 0)
 
+    @property
+    def flag(self) -> int:
+        """bit that marks a cell as covered by a word in this orientation"""
+        return 1 if self == Orientation.ACROSS else 2
+
 
 class Word:
 
     """class for dictionary items and their necessary properties"""
 
-    def __init__(self, letters) -> None:
+    def __init__(self, letters, hint: str = "", unit: str = "") -> None:
         """gather information that will help in analysing the dictionary"""
         self.letters: str = letters
-        self.hint: Literal[""] = ""  # definition to be added
+        self.hint: str = hint  # definition, shown as the clue
+        self.unit: str = unit  # where in the coursebook the word is from
         self.named_nodes: dict[int, str] = {}
-        self.orientation: Orientation
-        self.position: tuple[int, int]  # will need to be updated
 
     def __repr__(self) -> str:
         """use the word itself to represent this class"""
@@ -80,10 +114,25 @@ class Wordlist:
 
     def __init__(self, words) -> None:
         """analysis methods"""
-        self.items: list[Word] = [Word(item) for item in words]
+        # words that come in already made are copied, so analysing them
+        # again doesn't add to their old nodes
+        self.items: list[Word] = [
+            Word(item.letters, item.hint, item.unit)
+            if isinstance(item, Word)
+            else Word(item)
+            for item in words
+        ]
         self.items: list[Word] = self.analyse(self.items)
         self.unplaceables: list[Word] = self.filter_unplaceables()
 
+    @classmethod
+    def analysed(cls, words: list[Word]) -> "Wordlist":
+        """wrap words whose nodes have already been found"""
+        wordlist = cls([])
+        wordlist.items = words
+        wordlist.unplaceables = wordlist.filter_unplaceables()
+        return wordlist
+
     def __iter__(self) -> Iterator[Word]:
         """helper"""
         return iter([word for word in self.items])
@@ -120,18 +169,20 @@ class Wordlist:
 
     def analyse(self, items) -> list[Word]:
         """find common letters"""
+        # counting once up front keeps this linear in the number of letters
+        alphabet = self.alphabet
         for item in items:
             for index, letter in enumerate(item.letters):
-                if letter not in self.alphabet:
+                if letter not in alphabet:
                     continue
-                if self.alphabet[letter] == 1:
+                if alphabet[letter] == 1:
                     continue
                 item.named_nodes[index] = letter
 
         # throw out letters that only occur in the same word
         for item in items:
             for index, letter in item.named_nodes.items():
-                if self.alphabet[letter] == item.letters.count(letter):
+                if alphabet[letter] == item.letters.count(letter):
                     item.named_nodes[index] = 0
 
             # this seems to be necessary because
@@ -150,17 +201,297 @@ class Wordlist:
         return unplaceables
 
 
+class PackedWordlist:
+    """
+    read-only copy of an analysed Wordlist in one flat block of shared
+    memory, so that worker processes can attach to it by name instead of
+    each unpickling a copy of their own.
+
+    The block starts with a header of counts, followed by arrays of
+    unsigned ints, then the hints and units as UTF-8:
+
+        letters           code points of all words, one after the other
+        word_offsets      where each word starts in letters (plus the end)
+        nodes             positions of the named nodes of all words
+        node_offsets      where each word starts in nodes (plus the end)
+        text_offsets      where each hint and unit starts in the text
+    """
+
+    HEADER = ("words", "letters", "nodes", "text")
+
+    def __init__(self, memory: SharedMemory) -> None:
+        """map the arrays onto the block without copying anything"""
+        self.memory = memory
+        self.views: list[memoryview] = []
+        header = self.view(0, len(self.HEADER))
+        self.counts = dict(zip(self.HEADER, header))
+        words, letters, nodes, _ = header
+        start = len(self.HEADER)
+        sizes = {
+            "letters": letters,
+            "word_offsets": words + 1,
+            "nodes": nodes,
+            "node_offsets": words + 1,
+            "text_offsets": 2 * words + 1,
+        }
+        for name, size in sizes.items():
+            setattr(self, name, self.view(start, size))
+            start += size
+        self.text = memory.buf[start * 4:start * 4 + self.counts["text"]]
+        self.views.append(self.text)
+
+    def view(self, start: int, size: int) -> memoryview:
+        """a slice of the block as unsigned ints, counted in ints"""
+        view = self.memory.buf[start * 4:(start + size) * 4].cast("I")
+        self.views.append(view)
+        return view
+
+    @classmethod
+    def pack(cls, wordlist: Wordlist) -> "PackedWordlist":
+        """copy a wordlist into a new block of shared memory"""
+        words = list(wordlist)
+        texts = [
+            text.encode() for word in words for text in (word.hint, word.unit)
+        ]
+        arrays = [
+            array("I", [ord(c) for word in words for c in word.letters]),
+            array("I", accumulate((len(word) for word in words), initial=0)),
+            array("I", [node for word in words for node in word.nodes]),
+            array("I", accumulate((len(w.nodes) for w in words), initial=0)),
+            array("I", accumulate(map(len, texts), initial=0)),
+        ]
+        text = b"".join(texts)
+        header = array(
+            "I", [len(words), len(arrays[0]), len(arrays[2]), len(text)])
+        data = b"".join(part.tobytes() for part in [header, *arrays]) + text
+        memory = SharedMemory(create=True, size=max(len(data), 1))
+        memory.buf[:len(data)] = data
+        return cls(memory)
+
+    @classmethod
+    def attach(cls, name: str) -> "PackedWordlist":
+        """open a block packed by another process"""
+        try:
+            memory = SharedMemory(name, track=False)
+        except TypeError:
+            # before Python 3.13 this registers the block with the resource
+            # tracker again, which is harmless for the child processes of
+            # the one that packed it, as they share its tracker
+            memory = SharedMemory(name)
+        return cls(memory)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def close(self) -> None:
+        """detach from the block, it stays around for other processes"""
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """detach and free the block, once every process is done with it"""
+        self.close()
+        self.memory.unlink()
+
+    def __len__(self) -> int:
+        return self.counts["words"]
+
+    def __getitem__(self, number: int) -> Word:
+        """unpack a single word, with its nodes, hint and unit"""
+        start, end = self.word_offsets[number], self.word_offsets[number + 1]
+        letters = "".join(map(chr, self.letters[start:end]))
+        hint, unit = [
+            bytes(self.text[begin:finish]).decode()
+            for begin, finish in (
+                self.text_offsets[2 * number:2 * number + 2],
+                self.text_offsets[2 * number + 1:2 * number + 3],
+            )
+        ]
+        word = Word(letters, hint, unit)
+        first, last = self.node_offsets[number], self.node_offsets[number + 1]
+        word.named_nodes = {
+            node: letters[node] for node in self.nodes[first:last]
+        }
+        return word
+
+    def wordlist(self, numbers: list[int]) -> Wordlist:
+        """
+        some of the words as a Wordlist of their own. A node is kept if
+        another word among them has the same letter as a node, which is
+        what analysing them again would give, without counting letters.
+
+        This only holds if the packed nodes came from analysing the whole
+        packed vocabulary: nodes that were already narrowed down to some
+        other group of words can't be brought back.
+        """
+        words = [self[number] for number in numbers]
+        shared = Counter(
+            letter
+            for word in words
+            for letter in set(word.named_nodes.values())
+        )
+        for word in words:
+            word.named_nodes = {
+                node: letter
+                for node, letter in word.named_nodes.items()
+                if shared[letter] > 1
+            }
+        return Wordlist.analysed(words)
+
+
+class Placement(NamedTuple):
+    """
+    record of where a word went in a layout. These are never changed in
+    place, so forked layouts can share them: shifting or using up a node
+    makes a new record instead.
+    """
+
+    word: Word
+    orientation: Orientation
+    position: tuple[int, int]
+    named_nodes: dict[int, str]  # nodes that are still free to cross
+
+    @property
+    def letters(self) -> str:
+        return self.word.letters
+
+    def find_intersections(self, candidate) -> list[tuple[int, int]]:
+        """same as Word.find_intersections, but with the remaining nodes"""
+        return Word.find_intersections(self, candidate)
+
+
+class LiveView:
+    """
+    shows a layout in the terminal while it is being built. Only the cells
+    that changed since the last frame are redrawn, and frames that come in
+    faster than the frame rate are skipped rather than holding up the
+    search. Frames are cut off at the edges of the terminal, as the cursor
+    can't be moved back to lines that scrolled away or wrapped. When the
+    output isn't a terminal, only the final frame is printed, by close().
+    """
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        fps: float = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        # looked up now rather than at import, to follow redirect_stdout
+        self.stream = stream if stream is not None else sys.stdout
+        self.interval = 1 / fps if fps else 0
+        self.clock = clock
+        self.live = self.stream.isatty()
+        self.frame: list[str] = []  # the lines currently on screen
+        self.size: tuple[int, int] | None = None  # of the terminal
+        self.pending: list[list[str]] | None = None
+        self.last = -math.inf
+
+    @staticmethod
+    def render(grid: list[list[str]]) -> list[str]:
+        return [" ".join(row) for row in grid]
+
+    def draw(self, grid: list[list[str]]) -> None:
+        """show the grid, unless the previous frame was too recent"""
+        self.pending = grid
+        if not self.live:
+            return None
+        now = self.clock()
+        if now - self.last < self.interval:
+            return None
+        self.last = now
+        self.update(self.render(grid))
+        self.pending = None
+
+    def close(self) -> None:
+        """show the last grid that was skipped, if there was one"""
+        if self.pending is not None:
+            lines = self.render(self.pending)
+            if self.live:
+                self.update(lines)
+            else:
+                self.stream.write("".join(line + "\n" for line in lines))
+            self.pending = None
+        self.stream.flush()
+
+    def update(self, lines: list[str]) -> None:
+        """
+        move the cursor back to the top of the previous frame and write
+        over what changed. The cursor is left on the line below the frame.
+        """
+        columns, height = shutil.get_terminal_size()
+        codes: list[str] = []
+        if self.size != (columns, height):
+            # after a resize the old frame can't be found again
+            if self.size is not None:
+                codes.append("\x1b[2J\x1b[H")
+            self.size = (columns, height)
+            self.frame = []
+        # leave a line for the cursor, and a column so lines never wrap
+        lines = [line[: columns - 1] for line in lines[: height - 1]]
+        if self.frame:
+            codes.append(f"\x1b[{len(self.frame)}A")
+        skipped = 0
+        for number, line in enumerate(lines):
+            old = self.frame[number] if number < len(self.frame) else None
+            if line == old:
+                skipped += 1
+                continue
+            if skipped:
+                codes.append(f"\x1b[{skipped}B")
+                skipped = 0
+            if old is not None and len(old) == len(line):
+                changes = [i for i, (a, b) in enumerate(zip(old, line))
+                           if a != b]
+            else:
+                changes = []
+            if changes and len(changes) * 4 < len(line):
+                # ANSI columns count from 1
+                codes.extend(f"\x1b[{i + 1}G{line[i]}" for i in changes)
+                codes.append("\r\n")
+            else:
+                codes.append(f"\r{line}\x1b[K\n")
+        if skipped:
+            codes.append(f"\x1b[{skipped}B")
+        if len(lines) < len(self.frame):
+            # clear what is left of a frame that was taller
+            codes.append("\r\x1b[J")
+        self.stream.write("".join(codes))
+        self.stream.flush()
+        self.frame = lines
+
+
 class Layout:
     """here, the words are joined up and eventually, a completed
-    puzzle will be printed / output"""
+    puzzle will be printed / output
+
+    Layouts are copy-on-write: fork() hands out a twin that shares rows and
+    placement records with this one, and whichever writes first copies the
+    list of rows and then only the rows it actually changes.
+    """
 
     def __init__(
         self,
         grid: list[list[str]] = [[]],
+        verbose: bool = True,
+        view: LiveView | None = None,
     ) -> None:
         """set up dimensions of grid, track history"""
-        self.placed_words: List[Word] = []
+        self.placed_words: List[Placement] = []
+        self.unplaced: List[Word] = []
         self.grid: list[list[str]] = grid
+        # orientations of the words going through each cell, as flags
+        self.cover: list[list[int]] = [[0] * len(row) for row in grid]
+        self.verbose = verbose
+        self.view = view
+        # running totals, so layouts can be compared without a rescan
+        self.crossings: int = 0
+        self.anchors: int = 0
+        # the grid passed in (or the default) belongs to somebody else
+        self._shared: bool = True
+        self._owned_rows: set[int] = set()
 
     @property
     def rows(self):
@@ -174,6 +505,120 @@ class Layout:
         for line in self.grid:
             print(line)
 
+    def show(self) -> None:
+        """report progress, through the live view if there is one"""
+        if self.view is not None:
+            self.view.draw(self.grid)
+        elif self.verbose:
+            self.output()
+
+    def fork(self) -> "Layout":
+        """make a copy in constant time, for trying out different placements"""
+        self._shared = True
+        self._owned_rows = set()
+        twin = copy(self)
+        twin._owned_rows = set()
+        return twin
+
+    @classmethod
+    def from_placements(
+        cls,
+        placements: Iterable[Placement],
+        verbose: bool = True,
+    ) -> "Layout":
+        """
+        draw a layout from scratch, moving it to start at (0, 0). The
+        free nodes of the records are worked out again from the crossings
+        in the new grid, as the words may have been moved since.
+        """
+        placements = list(placements)
+        cells = [
+            (row + space * row_step, column + space * column_step)
+            for word, orientation, (row, column), _ in placements
+            for row_step, column_step in [orientation.value]
+            for space in range(len(word))
+        ]
+        top = min(row for row, _ in cells)
+        left = min(column for _, column in cells)
+        height = max(row for row, _ in cells) - top + 1
+        width = max(column for _, column in cells) - left + 1
+        layout = cls([["_"] * width for _ in range(height)], verbose)
+        for placement in placements:
+            row, column = placement.position
+            placement = placement._replace(position=(row - top, column - left))
+            layout.write(placement)
+            layout.placed_words.append(placement)
+        layout.placed_words = [
+            layout.free_nodes(placement) for placement in layout.placed_words
+        ]
+        layout.anchors = sum(
+            len(placement.named_nodes) for placement in layout.placed_words
+        )
+        return layout
+
+    def free_nodes(self, placement: Placement) -> Placement:
+        """
+        the record with the nodes of its word that are still free: like in
+        attach, a node next to a crossing is used up along with it
+        """
+        (row, column) = placement.position
+        row_step, column_step = placement.orientation.value
+        flag = placement.orientation.flag
+        used: set[int] = set()
+        for space in range(len(placement.word)):
+            cover = self.cover[row + space * row_step][
+                column + space * column_step]
+            if cover & ~flag:
+                used.update((space - 1, space, space + 1))
+        return placement._replace(
+            named_nodes={
+                key: val
+                for key, val in placement.word.named_nodes.items()
+                if key not in used
+            }
+        )
+
+    def set_aside(self, word: Word) -> None:
+        """note a word that couldn't be placed"""
+        self._unshare()
+        self.unplaced.append(word)
+
+    def _unshare(self) -> None:
+        """take a private copy of the lists before changing them"""
+        if self._shared:
+            self.grid = list(self.grid)
+            self.cover = list(self.cover)
+            self.placed_words = list(self.placed_words)
+            self.unplaced = list(self.unplaced)
+            self._shared = False
+
+    def _row(self, index: int) -> tuple[list[str], list[int]]:
+        """get a row and its cover that can be written to, copying them
+        if they aren't ours"""
+        self._unshare()
+        return self._writable(self.grid, index), self._writable(
+            self.cover, index)
+
+    def _writable(self, rows: list[list], index: int) -> list:
+        row = rows[index]
+        if id(row) not in self._owned_rows:
+            row = list(row)
+            rows[index] = row
+            self._owned_rows.add(id(row))
+        return row
+
+    def _shift(self, rows: int, columns: int) -> None:
+        """move every placed word by the given offsets"""
+        self.placed_words = [
+            placement._replace(
+                position=(
+                    placement.position[0] + rows,
+                    placement.position[1] + columns,
+                )
+            )
+            for placement in self.placed_words
+        ]
+
     def make_space(
         self,
         spaces=0,
@@ -182,130 +627,153 @@ class Layout:
     ):
         """This function inserts or append rows and columns. This also involves
         updating the position of the already placed words."""
+        self._unshare()
         match (orientation, forward):
             # trailing columns
             case (Orientation.ACROSS, True):
                 self.grid = [
                     row + ["_" for _ in range(0, spaces)] for row in self.grid]
+                self.cover = [row + [0] * spaces for row in self.cover]
+                self._owned_rows = {id(row) for row in self.grid + self.cover}
             # leading columns
             case (Orientation.ACROSS, False):
                 self.grid = [
                     ["_" for _ in range(0, spaces)] + row for row in self.grid]
+                self.cover = [[0] * spaces + row for row in self.cover]
+                self._owned_rows = {id(row) for row in self.grid + self.cover}
                 # update position of previously placed words
-                for word in self.placed_words:
-                    pos_row, pos_col = word.position
-                    pos_col += spaces
-                    word.position = (pos_row, pos_col)
+                self._shift(0, spaces)
             # trailing rows
             case (Orientation.DOWN, True):
                 for _ in range(0, spaces):
-                    self.grid.append(["_" for _ in range(0, self.columns)])
+                    row = ["_" for _ in range(0, self.columns)]
+                    cover = [0] * self.columns
+                    self.grid.append(row)
+                    self.cover.append(cover)
+                    self._owned_rows.update((id(row), id(cover)))
             # leading rows
             case (Orientation.DOWN, False):
                 for _ in range(0, spaces):
-                    self.grid.insert(0, ["_" for _ in range(0, self.columns)])
+                    row = ["_" for _ in range(0, self.columns)]
+                    cover = [0] * self.columns
+                    self.grid.insert(0, row)
+                    self.cover.insert(0, cover)
+                    self._owned_rows.update((id(row), id(cover)))
                 # update position of previously placed words
-                for word in self.placed_words:
-                    pos_row, pos_col = word.position
-                    pos_row += spaces
-                    word.position = (pos_row, pos_col)
+                self._shift(spaces, 0)
 
     def find_matching_word(
         self, next_word: Word, attempt=1
-    ) -> tuple[Word, list[tuple[int, int]]]:
+    ) -> tuple[int, list[tuple[int, int]]]:
         """Go through the list of previously placed
         words and find one that matches, then return
-        the chosen word and a list of possible
+        the index of the chosen word and a list of possible
         intersections"""
         # check previously placed word(s) for a match
         if attempt > len(self.placed_words):
-            self.output()
-            raise SystemExit(f"Can't match {next_word} with any of the others")
+            self.show()
+            raise PlacementError(
+                f"Can't match {next_word} with any of the others")
         prev_word = self.placed_words[-attempt]
-        next_word.orientation = [
-            _ for _ in Orientation if not _ == prev_word.orientation
-        ][0]
         possibilities = prev_word.find_intersections(next_word)
         if not possibilities:
             return self.find_matching_word(next_word, attempt=attempt + 1)
-        return prev_word, possibilities
+        return len(self.placed_words) - attempt, possibilities
 
     def place(self, next_word: Word) -> None:
         """find somewhere to put the word"""
         if not self.placed_words:
-            next_word.orientation = Orientation.ACROSS
             self.make_space(
                 len(next_word),
-                next_word.orientation,
+                Orientation.ACROSS,
                 forward=True,
             )
-            next_word.position = (0, 0)
-            self.write(next_word)
-            self.placed_words.append(next_word)
+            placement = Placement(
+                next_word,
+                Orientation.ACROSS,
+                (0, 0),
+                dict(next_word.named_nodes),
+            )
+            self.write(placement)
+            self.placed_words.append(placement)
+            self.anchors += len(next_word.named_nodes)
             return None
 
         # choose a possible connection
-        prev_word, possibilities = self.find_matching_word(next_word)
+        prev_index, possibilities = self.find_matching_word(next_word)
         # TODO: this could be a point where a choice between different
         # strategies could be made
-        possibility = possibilities[0]
+        self.attach(next_word, prev_index, possibilities[0])
+
+    def options(self, next_word: Word) -> list[tuple[int, tuple[int, int]]]:
+        """list every placed word and intersection the next word could
+        be attached to, whether or not it would collide"""
+        return [
+            (prev_index, possibility)
+            for prev_index, prev_word in enumerate(self.placed_words)
+            for possibility in prev_word.find_intersections(next_word)
+        ]
+
+    def attach(
+        self,
+        next_word: Word,
+        prev_index: int,
+        possibility: tuple[int, int],
+    ) -> bool:
+        """cross the next word with a placed one, returns False (after
+        growing the grid) if it would collide with other words"""
+        prev_word = self.placed_words[prev_index]
+        orientation = [
+            _ for _ in Orientation if not _ == prev_word.orientation
+        ][0]
         node_prev_word, node_next_word = possibility
 
         # start with the absolute position of the next word, which may
         # be out of bounds
         row_absolute, column_absolute = prev_word.position
         row_multiplier, column_multiplier = prev_word.orientation.value
-        next_word.position = (
-            (row_absolute + row_multiplier * node_prev_word),
-            (column_absolute + column_multiplier * node_prev_word),
-        )
+        row_next = row_absolute + row_multiplier * node_prev_word
+        column_next = column_absolute + column_multiplier * node_prev_word
 
         # calculate & make required space
-        if next_word.orientation == Orientation.ACROSS:
+        if orientation == Orientation.ACROSS:
             leading_spaces = prev_word.position[1] - node_next_word
         else:
             leading_spaces = prev_word.position[0] - node_next_word
         if leading_spaces < 0:
             self.make_space(
                 leading_spaces * -1,
-                next_word.orientation,
+                orientation,
                 forward=False,
             )
+            # the previous word's record was replaced by a shifted one
+            prev_word = self.placed_words[prev_index]
         # update position of next word
-        row_next, column_next = next_word.position
-        if next_word.orientation == Orientation.ACROSS:
-            next_word.position = (
-                row_next,
-                (prev_word.position[1] - node_next_word),
-            )
+        if orientation == Orientation.ACROSS:
+            column_next = prev_word.position[1] - node_next_word
         else:
-            next_word.position = (
-                (prev_word.position[0] - node_next_word),
-                column_next,
-            )
+            row_next = prev_word.position[0] - node_next_word
 
-        trailing_spaces = len(next_word) - node_next_word - 1
-        prev_row, prev_col = prev_word.position
-        if next_word.orientation == Orientation.ACROSS:
-            absolute_column = prev_col + node_next_word
-            space_needed = absolute_column + \
-                trailing_spaces > len(self.grid[0])
+        # measure from the start of the next word, as leading space may
+        # have been added since
+        if orientation == Orientation.ACROSS:
+            trailing_spaces = column_next + len(next_word) - self.columns
         else:
-            absolute_row = prev_row + node_next_word
-            space_needed = absolute_row + trailing_spaces > len(self.grid)
-        if space_needed:
+            trailing_spaces = row_next + len(next_word) - self.rows
+        if trailing_spaces > 0:
             self.make_space(
                 trailing_spaces,
-                next_word.orientation,
+                orientation,
                 forward=True,
             )
 
         # check if the position would lead to any conflicts
-        if not self.check(next_word.position, next_word):
-            return None
+        placement = Placement(
+            next_word, orientation, (row_next, column_next), {})
+        if not self.check(placement.position, placement):
+            return False
 
         # commit
-        self.write(next_word)
         # delete the used match from the named nodes of both words
         # to avoid future collisions
         prev_node = possibility[0]
@@ -314,42 +782,603 @@ class Layout:
         # NB this is a fairly blunt force approach as it doesn't take into
         # account the possibility of adjacent letters matching with the first
         # and last of two other words. Is there a way to allow for this?
-        prev_word.named_nodes.pop(prev_node - 1, None)
-        prev_word.named_nodes.pop(prev_node, None)
-        prev_word.named_nodes.pop(prev_node + 1, None)
-        next_word.named_nodes.pop(next_node - 1, None)
-        next_word.named_nodes.pop(next_node, None)
-        next_word.named_nodes.pop(next_node + 1, None)
-        self.placed_words.append(next_word)
-        self.output()
-
-    def check(self, position, word: Word) -> bool:
+        used_prev = (prev_node - 1, prev_node, prev_node + 1)
+        used_next = (next_node - 1, next_node, next_node + 1)
+        prev_nodes = {
+            key: val
+            for key, val in prev_word.named_nodes.items()
+            if key not in used_prev
+        }
+        next_nodes = {
+            key: val
+            for key, val in next_word.named_nodes.items()
+            if key not in used_next
+        }
+        self.anchors += (
+            len(prev_nodes) - len(prev_word.named_nodes) + len(next_nodes))
+        self.placed_words[prev_index] = prev_word._replace(
+            named_nodes=prev_nodes)
+        placement = placement._replace(named_nodes=next_nodes)
+        self.write(placement)
+        self.placed_words.append(placement)
+        self.show()
+        return True
+
+    def check(self, position, word: Placement) -> bool:
         """checks the existing grid (ignoring its bounds) for conflicting
-        letters and returns True if the word can be placed here"""
+        letters and returns True if the word can be placed here. Running
+        along a word in the same direction counts as a conflict too."""
         checks = []
         (row, column) = position
-        if word.orientation == Orientation.ACROSS:
-            for space, letter in enumerate(word.letters):
-                try:
-                    square = self.grid[row][column + space]
-                    checks.append(square == letter or square == "_")
-                except IndexError:
-                    checks.append(True)
-        if word.orientation == Orientation.DOWN:
-            for space, letter in enumerate(word.letters):
-                try:
-                    square = self.grid[row + space][column]
-                    checks.append(square == letter or square == "_")
-                except IndexError:
-                    checks.append(True)
+        row_step, column_step = word.orientation.value
+        for space, letter in enumerate(word.letters):
+            try:
+                square = self.grid[row + space * row_step][
+                    column + space * column_step]
+                cover = self.cover[row + space * row_step][
+                    column + space * column_step]
+                checks.append(
+                    (square == letter or square == "_")
+                    and not cover & word.orientation.flag
+                )
+            except IndexError:
+                checks.append(True)
         return all(checks)
 
-    def write(self, current_word: Word) -> None:
+    def write(self, current_word: Placement) -> None:
         """add single word to the grid"""
         (row, column) = current_word.position
-        if current_word.orientation == Orientation.ACROSS:
-            for space, letter in enumerate(current_word.letters):
-                self.grid[row][column + space] = letter
-        if current_word.orientation == Orientation.DOWN:
-            for space, letter in enumerate(current_word.letters):
-                self.grid[row + space][column] = letter
+        row_step, column_step = current_word.orientation.value
+        flag = current_word.orientation.flag
+        for space, letter in enumerate(current_word.letters):
+            line, cover = self._row(row + space * row_step)
+            cell = column + space * column_step
+            # only a word in the other direction makes a crossing
+            self.crossings += bool(cover[cell] & ~flag)
+            line[cell] = letter
+            cover[cell] |= flag
+
+
+class DisjointSet:
+    """union-find over word indexes, used to tell separate puzzles apart"""
+
+    def __init__(self, size: int) -> None:
+        self.parents: list[int] = list(range(size))
+        self.sizes: list[int] = [1] * size
+
+    def find(self, item: int) -> int:
+        """follow the parents up to the root, halving the path on the way"""
+        while self.parents[item] != item:
+            self.parents[item] = self.parents[self.parents[item]]
+            item = self.parents[item]
+        return item
+
+    def union(self, first: int, second: int) -> None:
+        """hang the smaller tree off the larger one"""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return None
+        if self.sizes[first] < self.sizes[second]:
+            first, second = second, first
+        self.parents[second] = first
+        self.sizes[first] += self.sizes[second]
+
+    def groups(self) -> list[list[int]]:
+        """list the members of every set, in order of first appearance"""
+        groups: dict[int, list[int]] = {}
+        for item in range(len(self.parents)):
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+def crossing_index(words: list[Word]) -> dict[str, list[int]]:
+    """
+    map every letter to the words that can cross on it. This is the
+    crossing graph in compact form: two words are joined if they share
+    a letter, so we don't need to store every pair of them.
+    """
+    index: dict[str, list[int]] = {}
+    for number, word in enumerate(words):
+        for letter in set(word.named_nodes.values()):
+            index.setdefault(letter, []).append(number)
+    return index
+
+
+def split_component(
+    component: list[int],
+    words: list[Word],
+    index: dict[str, list[int]],
+    size: int,
+) -> list[list[int]]:
+    """
+    cut a connected component into groups of roughly equal size. Each group
+    is grown from the word with the most possible crossings, always adding
+    the word that crosses the most letters already in the group.
+
+    Sets of words are the bits of an int, ranked so that the lowest bit is
+    the word with the most possible crossings. A letter joining the group
+    adds one to the score of every word that has it in one go, as the
+    scores are kept in binary, one int per bit.
+    """
+    if len(component) <= size:
+        return [component]
+    count = -(-len(component) // size)
+    target = -(-len(component) // count)
+    letters = {i: set(words[i].named_nodes.values()) for i in component}
+    degree = {i: sum(len(index[letter]) for letter in letters[i])
+              for i in component}
+    ranked = sorted(component, key=lambda i: (-degree[i], i))
+    having: dict[str, int] = {}
+    for bit, i in enumerate(ranked):
+        for letter in letters[i]:
+            having[letter] = having.get(letter, 0) | 1 << bit
+    unassigned = (1 << len(ranked)) - 1
+    groups: list[list[int]] = []
+    while unassigned:
+        group: list[int] = []
+        gained: set[str] = set()
+        scores: list[int] = []
+        while len(group) < target and unassigned:
+            # narrow down to the best score, from its highest bit down
+            best = unassigned
+            for bits in reversed(scores):
+                if best & bits:
+                    best &= bits
+            bit = (best & -best).bit_length() - 1
+            member = ranked[bit]
+            group.append(member)
+            unassigned &= ~(1 << bit)
+            for letter in letters[member] - gained:
+                gained.add(letter)
+                carry = having[letter]
+                for place, bits in enumerate(scores):
+                    scores[place], carry = bits ^ carry, bits & carry
+                    if not carry:
+                        break
+                else:
+                    scores.append(carry)
+        groups.append(group)
+    return groups
+
+
+def partition(wordlist: Wordlist, size: int = 25) -> list[list[Word]]:
+    """
+    sort a (possibly huge) vocabulary into groups of words that can make
+    up a puzzle of their own. Words without any nodes are left out, they
+    are already listed in Wordlist.unplaceables
+    """
+    words = [word for word in wordlist if word.nodes]
+    index = crossing_index(words)
+    components = DisjointSet(len(words))
+    for members in index.values():
+        for other in members[1:]:
+            components.union(members[0], other)
+    groups: list[list[Word]] = []
+    for component in components.groups():
+        for group in split_component(component, words, index, size):
+            groups.append([words[i] for i in group])
+    return groups
+
+
+def score(layout: Layout) -> int:
+    """
+    cheap measure of how promising a partial layout is: crossings and
+    free nodes count in its favour, every cell of the grid against it
+    """
+    return (
+        CROSSING_WEIGHT * layout.crossings
+        + ANCHOR_WEIGHT * layout.anchors
+        - layout.rows * layout.columns
+    )
+
+
+def beam_search(
+    words: list[Word],
+    width: int = 8,
+    view: LiveView | None = None,
+) -> Layout:
+    """
+    instead of committing to the first placement that works, keep the
+    best few partial layouts and try every legal placement of the next
+    word in each of them. Words that fit nowhere are set aside. A live
+    view is shown the best layout after every word.
+    """
+    beam = [Layout([[]], verbose=False)]
+    for word in words:
+        children: list[Layout] = []
+        for state in beam:
+            if not state.placed_words:
+                child = state.fork()
+                child.place(word)
+                children.append(child)
+                continue
+            for prev_index, possibility in state.options(word):
+                child = state.fork()
+                if child.attach(word, prev_index, possibility):
+                    children.append(child)
+        if not children:
+            for state in beam:
+                state.set_aside(word)
+            continue
+        scores = [score(child) for child in children]
+        best = nlargest(width, range(len(children)), key=scores.__getitem__)
+        beam = [children[i] for i in best]
+        if view is not None:
+            view.draw(beam[0].grid)
+    return max(beam, key=score)
+
+
+def lay_out(
+    words: Wordlist | list[Word] | list[str],
+    beam_width: int = 0,
+    view: LiveView | None = None,
+) -> Layout:
+    """
+    place a group of words in a fresh layout. Unlike calling Layout.place
+    directly, words that won't fit are set aside in Layout.unplaced.
+    With a beam width, beam_search is used instead of greedy placement.
+    Progress is drawn in the live view, if given; closing it is up to
+    the caller.
+    """
+    wordlist = words if isinstance(words, Wordlist) else Wordlist(words)
+    if beam_width:
+        return beam_search(wordlist.most_nodes, beam_width, view)
+    layout = Layout([[]], verbose=False, view=view)
+    for word in wordlist.most_nodes:
+        if layout.placed_words and not word.nodes:
+            layout.set_aside(word)
+            continue
+        placed = len(layout.placed_words)
+        try:
+            layout.place(word)
+        except PlacementError:
+            pass
+        if len(layout.placed_words) == placed:
+            layout.set_aside(word)
+    return layout
+
+
+def lay_out_groups(
+    wordlist: Wordlist,
+    size: int = 25,
+    processes: int | None = None,
+    beam_width: int = 0,
+) -> list[Layout]:
+    """
+    split the vocabulary into puzzle-sized groups and lay each of them out
+    in a worker process. With processes=1 everything runs in this process.
+    Words that don't fit are left in the layouts' unplaced lists.
+    """
+    groups = partition(wordlist, size)
+    if processes == 1:
+        return [lay_out(group, beam_width) for group in groups]
+    # the workers get the vocabulary through shared memory, so all that
+    # is sent with each group is the numbers of its words
+    numbers = {id(word): number for number, word in enumerate(wordlist)}
+    jobs = [[numbers[id(word)] for word in group] for group in groups]
+    packed = PackedWordlist.pack(wordlist)
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(
+                executor.map(
+                    lay_out_packed,
+                    repeat(packed.name),
+                    jobs,
+                    repeat(beam_width),
+                )
+            )
+    finally:
+        packed.unlink()
+
+
+def lay_out_all(
+    wordlist: Wordlist,
+    size: int = 25,
+    processes: int | None = None,
+    beam_width: int = 0,
+) -> tuple[list[Layout], list[Word]]:
+    """
+    lay out the whole vocabulary as puzzles. The words that didn't fit
+    into their puzzle are grouped and laid out again, until a round makes
+    no more puzzles. Returns the puzzles and the leftover words that are
+    in none of them; every word of the vocabulary is in one or the other.
+    """
+    puzzles: list[Layout] = []
+    leftovers: list[Word] = []
+    while True:
+        # partition leaves out words that can't cross any of the others
+        leftovers.extend(wordlist.unplaceables)
+        retry: list[Word] = []
+        made = 0
+        for layout in lay_out_groups(wordlist, size, processes, beam_width):
+            retry.extend(layout.unplaced)
+            layout.unplaced = []
+            # a single word doesn't make a puzzle
+            if len(layout.placed_words) > 1:
+                puzzles.append(layout)
+                made += 1
+            else:
+                retry.extend(
+                    placement.word for placement in layout.placed_words
+                )
+        if not made or not retry:
+            leftovers.extend(retry)
+            return puzzles, leftovers
+        # analysed afresh, as the nodes they had were only good for
+        # crossing the words of their old group
+        wordlist = Wordlist(retry)
+
+
+# vocabularies a worker process has attached to, by name
+ATTACHED: dict[str, PackedWordlist] = {}
+
+
+def lay_out_packed(name: str, numbers: list[int], beam_width: int) -> Layout:
+    """lay out some words of a packed vocabulary, in a worker process"""
+    if name not in ATTACHED:
+        ATTACHED[name] = PackedWordlist.attach(name)
+    packed = ATTACHED[name]
+    return lay_out(packed.wordlist(numbers), beam_width)
+
+
+def normalise(letters: str) -> str:
+    """turn a spreadsheet entry into something that fits in a grid"""
+    # some tools write umlauts as a vowel followed by a combining mark
+    letters = unicodedata.normalize("NFC", letters)
+    return letters.lower().translate(UMLAUTS).translate(SEPARATORS)
+
+
+def read_vocabulary(
+    path: str | PathLike,
+    word_column: str = "word",
+    hint_column: str = "definition",
+    unit_column: str = "unit",
+    chunk_size: int = 1000,
+) -> Iterator[Word]:
+    """
+    read words and their definitions from a CSV export of a spreadsheet,
+    one chunk of rows at a time so that memory use doesn't grow with the
+    size of the file. Commas, semicolons and tabs are all recognised as
+    separators. Repeated words are only passed on the first time.
+    """
+    seen: set[str] = set()
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        try:
+            dialect = csv.Sniffer().sniff(handle.read(4096), ",;\t")
+        except csv.Error:
+            # a single column has no separator to find
+            dialect = csv.excel
+        handle.seek(0)
+        reader = csv.reader(handle, dialect)
+        header = [name.strip().lower() for name in next(reader, [])]
+        names = [
+            name.strip().lower()
+            for name in (word_column, hint_column, unit_column)
+        ]
+        if names[0] not in header:
+            raise ValueError(f"{path} has no column called {word_column}")
+        columns = [
+            header.index(name) if name in header else None for name in names
+        ]
+        while chunk := list(islice(reader, chunk_size)):
+            for row in chunk:
+                letters, hint, unit = [
+                    row[index] if index is not None and index < len(row)
+                    else ""
+                    for index in columns
+                ]
+                letters = normalise(letters)
+                if not letters or letters in seen:
+                    continue
+                seen.add(letters)
+                yield Word(letters, " ".join(hint.split()), unit.strip())
+
+
+def wordlists_by_unit(words: Iterable[Word]) -> Iterator[tuple[str, Wordlist]]:
+    """
+    collect consecutive words from the same unit into a Wordlist each.
+    Coursebook exports list their units in order, so only one unit needs
+    to be held at a time.
+    """
+    for unit, group in groupby(words, key=lambda word: word.unit):
+        yield unit, Wordlist(group)
+
+
+class Annealer:
+    """
+    tidies up a finished layout by moving words that hang off a single
+    crossing to some other crossing, keeping moves that make the grid
+    smaller or add crossings, and sometimes ones that don't, so the
+    search can get out of dead ends.
+
+    The grid is kept as a dict of cells with counters per row and column,
+    so the effect of a move is worked out from the cells of the moved word
+    alone.
+    """
+
+    def __init__(self, layout: Layout, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+        self.placements: list[Placement] = list(layout.placed_words)
+        self.letters: dict[tuple[int, int], str] = {}
+        # how many words run across and down through each cell
+        self.across: Counter[tuple[int, int]] = Counter()
+        self.down: Counter[tuple[int, int]] = Counter()
+        self.row_counts: Counter[int] = Counter()
+        self.column_counts: Counter[int] = Counter()
+        self.crossings = 0
+        self.top = self.left = 0
+        self.bottom = self.right = -1
+        # where each letter occurs in each word, to find new crossings
+        self.occurrences: list[dict[str, list[int]]] = []
+        for placement in self.placements:
+            occurrences: dict[str, list[int]] = {}
+            for index, letter in enumerate(placement.letters):
+                occurrences.setdefault(letter, []).append(index)
+            self.occurrences.append(occurrences)
+            self.add(placement)
+
+    @staticmethod
+    def cells(placement: Placement) -> Iterator[tuple[int, int]]:
+        row, column = placement.position
+        row_step, column_step = placement.orientation.value
+        for space in range(len(placement.letters)):
+            yield (row + space * row_step, column + space * column_step)
+
+    def counters(self, orientation: Orientation) -> tuple[Counter, Counter]:
+        """the counter for this orientation and the one for the other"""
+        if orientation == Orientation.ACROSS:
+            return self.across, self.down
+        return self.down, self.across
+
+    def fits(self, placement: Placement) -> bool:
+        """no clashing letters, and no running along another word"""
+        same, _ = self.counters(placement.orientation)
+        for cell, letter in zip(self.cells(placement), placement.letters):
+            if same[cell] or self.letters.get(cell, letter) != letter:
+                return False
+        return True
+
+    def add(self, placement: Placement) -> None:
+        same, other = self.counters(placement.orientation)
+        for cell, letter in zip(self.cells(placement), placement.letters):
+            # crossings are pairs of words going across and down
+            self.crossings += other[cell]
+            if not same[cell] and not other[cell]:
+                self.occupy(cell, letter)
+            same[cell] += 1
+
+    def remove(self, placement: Placement) -> None:
+        same, other = self.counters(placement.orientation)
+        for cell in self.cells(placement):
+            same[cell] -= 1
+            self.crossings -= other[cell]
+            if not same[cell] and not other[cell]:
+                self.vacate(cell)
+
+    def occupy(self, cell: tuple[int, int], letter: str) -> None:
+        self.letters[cell] = letter
+        row, column = cell
+        self.row_counts[row] += 1
+        self.column_counts[column] += 1
+        if self.bottom < self.top:
+            self.top = self.bottom = row
+            self.left = self.right = column
+        self.top = min(self.top, row)
+        self.bottom = max(self.bottom, row)
+        self.left = min(self.left, column)
+        self.right = max(self.right, column)
+
+    def vacate(self, cell: tuple[int, int]) -> None:
+        del self.letters[cell]
+        row, column = cell
+        self.row_counts[row] -= 1
+        self.column_counts[column] -= 1
+        # only an emptied edge needs the bounds to move
+        while self.top < self.bottom and not self.row_counts[self.top]:
+            self.top += 1
+        while self.bottom > self.top and not self.row_counts[self.bottom]:
+            self.bottom -= 1
+        while self.left < self.right and not self.column_counts[self.left]:
+            self.left += 1
+        while self.right > self.left and not self.column_counts[self.right]:
+            self.right -= 1
+
+    def crossings_of(self, placement: Placement) -> int:
+        _, other = self.counters(placement.orientation)
+        return sum(1 for cell in self.cells(placement) if other[cell])
+
+    @property
+    def score(self) -> int:
+        """lower is better, same weighting as the beam search"""
+        area = (self.bottom - self.top + 1) * (self.right - self.left + 1)
+        return area - CROSSING_WEIGHT * self.crossings
+
+    def propose(self, index: int) -> Placement | None:
+        """pick another crossing for a word at random"""
+        anchor = self.random.randrange(len(self.placements))
+        if anchor == index:
+            return None
+        target = self.placements[anchor]
+        node = self.random.randrange(len(target.letters))
+        matches = self.occurrences[index].get(target.letters[node])
+        if not matches:
+            return None
+        offset = self.random.choice(matches)
+        row, column = target.position
+        if target.orientation == Orientation.ACROSS:
+            return self.placements[index]._replace(
+                orientation=Orientation.DOWN,
+                position=(row - offset, column + node),
+            )
+        return self.placements[index]._replace(
+            orientation=Orientation.ACROSS,
+            position=(row + node, column - offset),
+        )
+
+    def accept(self, delta: int, temperature: float) -> bool:
+        """
+        always take improvements, and worse moves with a chance that falls
+        as the temperature does. At zero this is plain local search.
+        """
+        if delta <= 0:
+            return True
+        if temperature <= 0:
+            return False
+        return self.random.random() < math.exp(-delta / temperature)
+
+    def run(
+        self,
+        moves: int = 10000,
+        temperature: float = 20.0,
+        cooling: float = 0.9995,
+    ) -> list[Placement]:
+        """anneal for a number of moves, returning the best layout seen"""
+        best_score = self.score
+        best = list(self.placements)
+        for _ in range(moves):
+            temperature *= cooling
+            index = self.random.randrange(len(self.placements))
+            old = self.placements[index]
+            # words with more than one crossing may hold others in place,
+            # so moving them could break the puzzle apart
+            if self.crossings_of(old) != 1:
+                continue
+            new = self.propose(index)
+            if new is None or new.position == old.position:
+                continue
+            before = self.score
+            self.remove(old)
+            if not self.fits(new):
+                self.add(old)
+                continue
+            self.add(new)
+            delta = self.score - before
+            if not self.accept(delta, temperature):
+                self.remove(new)
+                self.add(old)
+                continue
+            self.placements[index] = new
+            if self.score < best_score:
+                best_score = self.score
+                best = list(self.placements)
+        return best
+
+
+def compact(
+    layout: Layout,
+    moves: int = 10000,
+    seed: int = 0,
+    temperature: float = 20.0,
+    cooling: float = 0.9995,
+) -> Layout:
+    """
+    shrink a finished layout and add crossings by moving words around.
+    The same seed always gives the same result.
+    """
+    if len(layout.placed_words) < 2:
+        return layout
+    annealer = Annealer(layout, seed)
+    placements = annealer.run(moves, temperature, cooling)
+    compacted = Layout.from_placements(placements, layout.verbose)
+    compacted.unplaced = list(layout.unplaced)
+    return compacted
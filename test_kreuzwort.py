@@ -1,7 +1,29 @@
 """tests for kreuzwort.py"""
 
+import io
+import random
+from contextlib import redirect_stdout
+
 import pytest
-from kreuzwort import Layout, Orientation, Word, Wordlist
+from benchmark import VOCABULARY
+from kreuzwort import (
+    Layout,
+    LiveView,
+    PackedWordlist,
+    Orientation,
+    Placement,
+    PlacementError,
+    Word,
+    Wordlist,
+    compact,
+    lay_out,
+    lay_out_all,
+    lay_out_groups,
+    normalise,
+    partition,
+    read_vocabulary,
+    wordlists_by_unit,
+)
 
 
 @pytest.mark.parametrize(
@@ -345,9 +367,7 @@ def test_write() -> None:
         ]
     )
     word = Wordlist(["abc"])[0]
-    word.position = (1, 0)
-    word.orientation = Orientation.ACROSS
-    table.write(word)
+    table.write(Placement(word, Orientation.ACROSS, (1, 0), {}))
     assert table.grid == [
         ["_", "_", "_"],
         ["a", "b", "c"],
@@ -471,3 +491,472 @@ def test_fresh_start() -> None:
     """
     layout = Layout([[]])
     assert layout.grid == [[]]
+
+
+@pytest.mark.parametrize(
+    "inputs,expected",
+    [
+        (
+            ["chair", "card", "bet", "xyz", "zoo"],
+            [["chair", "card"], ["xyz", "zoo"]],
+        ),
+        (
+            ["book", "tissue", "water"],
+            [["tissue", "water"]],
+        ),
+    ],
+)
+def test_partition(inputs, expected) -> None:
+    """
+    words that can't cross each other, even via other words, should end up
+    in separate puzzles, and words without any nodes in none of them
+    """
+    assert expected == partition(Wordlist(inputs))
+
+
+def test_balanced_partition() -> None:
+    """a large connected vocabulary should be cut into even groups"""
+    words = [a + b + c for a in "abcd" for b in "efgh" for c in "ijk"]
+    groups = partition(Wordlist(words), size=10)
+    assert sorted(len(group) for group in groups) == [8, 10, 10, 10, 10]
+    assert sorted(w.letters for g in groups for w in g) == sorted(words)
+
+
+def test_placement_error() -> None:
+    """a word that can't attach anywhere should raise a catchable error"""
+    layout = Layout([[]], verbose=False)
+    layout.place(Word("abc"))
+    with pytest.raises(PlacementError):
+        layout.place(Word("xyz"))
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_lay_out_all(processes) -> None:
+    """every group is laid out on its own, in or out of process"""
+    words = ["chair", "cardboard", "speaker", "tuft", "funny"]
+    layouts, leftovers = lay_out_all(Wordlist(words), processes=processes)
+    assert leftovers == []
+    assert [layout.grid for layout in layouts] == [
+        [
+            ["_", "_", "_", "c", "a", "r", "d", "b", "o", "a", "r", "d"],
+            ["_", "_", "_", "h", "_", "_", "_", "_", "_", "_", "_", "_"],
+            ["s", "p", "e", "a", "k", "e", "r", "_", "_", "_", "_", "_"],
+            ["_", "_", "_", "i", "_", "_", "_", "_", "_", "_", "_", "_"],
+            ["_", "_", "_", "r", "_", "_", "_", "_", "_", "_", "_", "_"],
+        ],
+        [
+            ["_", "f", "_", "_"],
+            ["t", "u", "f", "t"],
+            ["_", "n", "_", "_"],
+            ["_", "n", "_", "_"],
+            ["_", "y", "_", "_"],
+        ],
+    ]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_lay_out_all_leftovers(processes) -> None:
+    """
+    words that don't fit into their puzzle get another round, and those
+    that fit nowhere are handed back instead of being dropped
+    """
+    words = ["ddba", "adde", "caa", "cad", "dcb", "qrs"]
+    layouts, leftovers = lay_out_all(Wordlist(words), processes=processes)
+    assert [
+        [placement.word.letters for placement in layout.placed_words]
+        for layout in layouts
+    ] == [["ddba", "adde", "caa"], ["cad", "dcb"]]
+    assert all(not layout.unplaced for layout in layouts)
+    assert [word.letters for word in leftovers] == ["qrs"]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+@pytest.mark.parametrize(
+    "words, puzzles, expected",
+    [
+        (["ax", "bxy", "cy"], [["bxy", "ax"]], ["cy"]),
+        (
+            ["chair", "cardboard", "speaker", "bottle", "tablet"],
+            [["cardboard", "chair"], ["tablet", "bottle"]],
+            ["speaker"],
+        ),
+    ],
+)
+def test_lay_out_all_stranded(processes, words, puzzles, expected) -> None:
+    """
+    a word that can't cross any of the other leftovers any more is handed
+    back, not lost
+    """
+    layouts, leftovers = lay_out_all(
+        Wordlist(words), size=2, processes=processes
+    )
+    assert [
+        [placement.word.letters for placement in layout.placed_words]
+        for layout in layouts
+    ] == puzzles
+    assert [word.letters for word in leftovers] == expected
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_lay_out_all_parity(seed) -> None:
+    """
+    workers should make the same puzzles as this process, in the rounds
+    that retry the leftovers as well as in the first one
+    """
+    generator = random.Random(seed)
+    words = [
+        "".join(generator.sample(word, len(word)))
+        for word in generator.choices(VOCABULARY, k=200)
+    ]
+    first = lay_out_groups(Wordlist(words), processes=1)
+    assert any(layout.unplaced for layout in first)
+    here, left_here = lay_out_all(Wordlist(words), processes=1)
+    there, left_there = lay_out_all(Wordlist(words), processes=2)
+    # the retry rounds made puzzles of their own
+    assert len(here) > sum(len(layout.placed_words) > 1 for layout in first)
+    assert [layout.grid for layout in here] == [
+        layout.grid for layout in there
+    ]
+    assert [word.letters for word in left_here] == [
+        word.letters for word in left_there
+    ]
+
+
+def test_fork() -> None:
+    """
+    placing a word in a fork should leave the original alone, and only
+    the rows that were written to should stop being shared
+    """
+    words = Wordlist(["cardboard", "chair", "speaker"]).most_nodes
+    layout = Layout([[]], verbose=False)
+    layout.place(words[0])
+    layout.place(words[1])
+    before = [list(row) for row in layout.grid]
+    twin = layout.fork()
+    twin.place(words[2])
+    assert layout.grid == before
+    assert len(layout.placed_words) == 2
+    assert len(twin.placed_words) == 3
+    assert twin.grid[2][:7] == ["s", "p", "e", "a", "k", "e", "r"]
+
+    other = layout.fork()
+    other.write(Placement(Word("ax"), Orientation.ACROSS, (2, 1), {}))
+    assert [row is same for row, same in zip(layout.grid, other.grid)] == [
+        True,
+        True,
+        False,
+        True,
+        True,
+    ]
+
+
+def test_placement_records() -> None:
+    """placed words are kept as records, leaving the words themselves as
+    they came out of the wordlist"""
+    words = Wordlist(["chair", "cardboard"])
+    layout = Layout([[]], verbose=False)
+    for word in words.most_nodes:
+        layout.place(word)
+    assert layout.placed_words[1] == Placement(
+        words[0], Orientation.DOWN, (0, 0), {2: "a", 4: "r"}
+    )
+    assert words[0].named_nodes == {0: "c", 2: "a", 4: "r"}
+    assert not hasattr(words[0], "position")
+    assert not hasattr(words[0], "orientation")
+
+
+def test_grid_argument_untouched() -> None:
+    """the grid passed to the constructor should not be changed"""
+    initial = [["_", "_"], ["_", "_"]]
+    layout = Layout(initial)
+    layout.make_space(1, Orientation.DOWN, True)
+    layout.write(Placement(Word("ab"), Orientation.ACROSS, (0, 0), {}))
+    assert initial == [["_", "_"], ["_", "_"]]
+    assert layout.grid == [["a", "b"], ["_", "_"], ["_", "_"]]
+
+
+def test_options() -> None:
+    """every placed word and intersection should be offered"""
+    words = Wordlist(["cardboard", "chair", "speaker"]).most_nodes
+    layout = Layout([[]], verbose=False)
+    layout.place(words[0])
+    layout.place(words[1])
+    assert layout.options(words[2]) == [
+        (0, (2, 6)),
+        (0, (6, 3)),
+        (0, (7, 6)),
+        (1, (2, 3)),
+        (1, (4, 6)),
+    ]
+
+
+def test_beam_search() -> None:
+    """
+    keeping several partial layouts around should find a smaller grid
+    than committing to the first placement that works
+    """
+    inputs = ["chair", "speaker", "bottle", "cardboard"]
+    greedy = lay_out(inputs)
+    beam = lay_out(inputs, beam_width=2)
+    assert beam.unplaced == []
+    assert beam.rows * beam.columns < greedy.rows * greedy.columns
+    assert beam.grid == [
+        ["_", "_", "_", "_", "_", "s", "_", "_", "_", "_", "_", "_"],
+        ["_", "_", "_", "_", "_", "p", "_", "_", "_", "_", "_", "_"],
+        ["b", "o", "t", "t", "l", "e", "_", "_", "_", "_", "c", "_"],
+        ["_", "_", "_", "_", "_", "a", "_", "_", "_", "_", "h", "_"],
+        ["_", "_", "_", "_", "_", "k", "_", "_", "_", "_", "a", "_"],
+        ["_", "_", "_", "_", "_", "e", "_", "_", "_", "_", "i", "_"],
+        ["_", "_", "_", "c", "a", "r", "d", "b", "o", "a", "r", "d"],
+    ]
+
+
+@pytest.mark.parametrize(
+    "inputs,expected",
+    [
+        ("Chair", "chair"),
+        ("ice cream", "icecream"),
+        ("T-Shirt", "tshirt"),
+        ("Fußball", "fussball"),
+        ("Bücherregal", "buecherregal"),
+        ("ÄRGER", "aerger"),
+        ("Ka\u0308se", "kaese"),
+        ("Mu\u0308ller-Stra\u00dfe", "muellerstrasse"),
+    ],
+)
+def test_normalise(inputs, expected) -> None:
+    """spreadsheet entries should be folded into lowercase letters only"""
+    assert expected == normalise(inputs)
+
+
+@pytest.mark.parametrize("separator", [",", ";", "\t"])
+def test_read_vocabulary(tmp_path, separator) -> None:
+    """
+    given a spreadsheet export, this should yield normalised words with
+    their definitions, leaving out repeats
+    """
+    rows = [
+        ["Unit", "Word", "Definition"],
+        ["1", "Chair", "you sit on it"],
+        ["1", "ice cream", "a  cold   dessert"],
+        ["1", "chair", "this one is a repeat"],
+        ["2", "Käse", "made from milk"],
+    ]
+    path = tmp_path / "vocabulary.csv"
+    path.write_text("\n".join(separator.join(row) for row in rows) + "\n")
+    words = list(read_vocabulary(path, chunk_size=2))
+    assert words == ["chair", "icecream", "kaese"]
+    assert [word.hint for word in words] == [
+        "you sit on it",
+        "a cold dessert",
+        "made from milk",
+    ]
+    assert [word.unit for word in words] == ["1", "1", "2"]
+    named = read_vocabulary(path, word_column="Word", unit_column="UNIT")
+    assert [word.unit for word in named] == ["1", "1", "2"]
+
+
+def test_wordlists_by_unit() -> None:
+    """words should be analysed unit by unit, keeping their hints"""
+    words = [
+        Word("chair", "you sit on it", "1"),
+        Word("card", "a birthday greeting", "1"),
+        Word("tissue", "for your nose", "2"),
+        Word("water", "you drink it", "2"),
+    ]
+    units = list(wordlists_by_unit(iter(words)))
+    assert [unit for unit, _ in units] == ["1", "2"]
+    assert [word.named_nodes for word in units[1][1]] == [
+        {0: "t", 5: "e"},
+        {2: "t", 3: "e"},
+    ]
+    assert units[0][1][0].hint == "you sit on it"
+    assert words[2].named_nodes == {}
+
+
+def test_compact() -> None:
+    """
+    moving words to other crossings should give a grid that is no larger
+    and still holds every word, and the same seed the same grid
+    """
+    words = ["armchair", "variety", "uncle", "country", "special", "rucksack"]
+    layout = lay_out(words)
+    compacted = compact(layout, moves=2000, seed=1)
+    assert compacted.rows * compacted.columns < layout.rows * layout.columns
+    assert compacted.crossings >= len(compacted.placed_words) - 1
+    assert compacted.grid == compact(layout, moves=2000, seed=1).grid
+    grid = compacted.grid
+    for word, orientation, (row, column), _ in compacted.placed_words:
+        down, across = orientation.value
+        assert word.letters == "".join(
+            grid[row + space * down][column + space * across]
+            for space in range(len(word))
+        )
+
+
+def test_compact_free_nodes() -> None:
+    """
+    the moved words should only list nodes that aren't crossed or next to
+    a crossing, and count those as anchors
+    """
+    words = ["armchair", "variety", "uncle", "country", "special", "rucksack"]
+    compacted = compact(lay_out(words), moves=2000, seed=1)
+    nodes = {
+        placement.word.letters: sorted(placement.named_nodes)
+        for placement in compacted.placed_words
+    }
+    assert nodes["armchair"] == [0, 1, 7]
+    assert nodes["uncle"] == []
+    for placement in compacted.placed_words:
+        (row, column) = placement.position
+        down, across = placement.orientation.value
+        for space in range(len(placement.word)):
+            cell = (row + space * down, column + space * across)
+            if compacted.cover[cell[0]][cell[1]] & ~placement.orientation.flag:
+                assert not {space - 1, space, space + 1} & set(
+                    placement.named_nodes
+                )
+    assert compacted.anchors == sum(map(len, nodes.values()))
+
+
+class Terminal(io.StringIO):
+    """stands in for a terminal in the live view tests"""
+
+    def isatty(self) -> bool:
+        return True
+
+
+@pytest.fixture
+def screen(monkeypatch) -> None:
+    """a terminal of 80x24, whatever the tests are run in"""
+    monkeypatch.setenv("COLUMNS", "80")
+    monkeypatch.setenv("LINES", "24")
+
+
+def test_live_view_changes(screen) -> None:
+    """after the first frame, only the changed cells should be redrawn"""
+    stream = Terminal()
+    view = LiveView(stream, fps=0)
+    view.draw([["a", "b"], ["_", "_"]])
+    assert stream.getvalue() == "\ra b\x1b[K\n\r_ _\x1b[K\n"
+    stream.seek(0)
+    stream.truncate()
+    view.draw([["a", "b", "_", "_", "_"], ["_", "_", "_", "_", "c"]])
+    view.draw([["a", "b", "_", "_", "_"], ["_", "x", "_", "_", "c"]])
+    assert stream.getvalue().split("\x1b[2A")[-1] == "\x1b[1B\x1b[3Gx\r\n"
+
+
+def test_live_view_throttle(screen) -> None:
+    """frames coming in too quickly should be dropped, but not the last"""
+    stream = Terminal()
+    times = iter([0.0, 0.05, 0.08])
+    view = LiveView(stream, fps=10, clock=lambda: next(times))
+    view.draw([["a"]])
+    view.draw([["b"]])
+    view.draw([["c"]])
+    assert "b" not in stream.getvalue()
+    assert "c" not in stream.getvalue()
+    view.close()
+    assert stream.getvalue().endswith("\x1b[1A\rc\x1b[K\n")
+
+
+def test_live_view_not_a_terminal(screen) -> None:
+    """without a terminal, only the final frame should be printed"""
+    stream = io.StringIO()
+    view = LiveView(stream)
+    layout = lay_out(["chair", "cardboard"], view=view)
+    assert stream.getvalue() == ""
+    view.close()
+    assert stream.getvalue().splitlines() == [
+        " ".join(row) for row in layout.grid
+    ]
+
+
+def test_packed_wordlist() -> None:
+    """
+    a wordlist packed into shared memory should give back the same words,
+    nodes and hints to anyone attaching to it, and some of its words as a
+    wordlist of their own
+    """
+    wordlist = Wordlist(
+        [
+            Word("chair", "you sit on it", "1"),
+            Word("cardboard", "boxes are made of it", "1"),
+            Word("speaker", "makes music louder", "2"),
+            "bottle",
+        ]
+    )
+    packed = PackedWordlist.pack(wordlist)
+    attached = PackedWordlist.attach(packed.name)
+    try:
+        words = [attached[number] for number in range(len(attached))]
+        assert words == ["chair", "cardboard", "speaker", "bottle"]
+        assert [word.named_nodes for word in words] == [
+            word.named_nodes for word in wordlist
+        ]
+        assert [word.hint for word in words] == [
+            "you sit on it",
+            "boxes are made of it",
+            "makes music louder",
+            "",
+        ]
+        group = attached.wordlist([0, 2, 3])
+        analysed = Wordlist(["chair", "speaker", "bottle"])
+        assert [word.named_nodes for word in group] == [
+            word.named_nodes for word in analysed
+        ]
+        assert group[0].hint == "you sit on it"
+    finally:
+        attached.close()
+        packed.unlink()
+
+
+def test_parallel_overlap() -> None:
+    """
+    a word may share a cell with a word going the other way, but not run
+    along one going the same way, even when all the letters match
+    """
+    layout = Layout([["_"] * 8 for _ in range(8)], verbose=False)
+    layout.write(Placement(Word("armchair"), Orientation.DOWN, (0, 2), {}))
+    inside = Placement(Word("chair"), Orientation.DOWN, (3, 2), {})
+    across = Placement(Word("chair"), Orientation.ACROSS, (3, 2), {})
+    assert not layout.check(inside.position, inside)
+    assert layout.check(across.position, across)
+    layout.write(across)
+    assert layout.crossings == 1
+
+
+def test_live_view_clipped(monkeypatch) -> None:
+    """
+    a frame larger than the terminal should be cut off at its edges, and
+    a resize should start over with a clear screen
+    """
+    monkeypatch.setenv("COLUMNS", "6")
+    monkeypatch.setenv("LINES", "3")
+    stream = Terminal()
+    view = LiveView(stream, fps=0)
+    view.draw([list("abcd"), list("efgh"), list("ijkl")])
+    assert stream.getvalue() == "\ra b c\x1b[K\n\re f g\x1b[K\n"
+    monkeypatch.setenv("COLUMNS", "8")
+    stream.seek(0)
+    stream.truncate()
+    view.draw([["a", "b", "c", "d"]])
+    assert stream.getvalue() == "\x1b[2J\x1b[H\ra b c d\x1b[K\n"
+
+
+def test_live_view_redirected() -> None:
+    """without a stream, the view should write to stdout as it is then"""
+    stream = io.StringIO()
+    with redirect_stdout(stream):
+        view = LiveView()
+    view.draw([["a"]])
+    view.close()
+    assert stream.getvalue() == "a\n"
+
+
+def test_compact_local_search() -> None:
+    """at zero temperature only moves that don't make it worse are taken"""
+    layout = lay_out(["armchair", "variety", "uncle", "country", "special"])
+    compacted = compact(layout, moves=2000, seed=1, temperature=0)
+    assert compacted.rows * compacted.columns <= layout.rows * layout.columns
+    assert len(compacted.placed_words) == len(layout.placed_words)
@@ -0,0 +1,115 @@
+"""
+scaling tests for kreuzwort.py
+
+These don't check results but how run time grows with the size of the
+input, to catch things like quadratic rescans creeping back in. The timed
+ones take a while and are left out by default, run them with
+
+    python -m pytest -m scaling
+"""
+
+import math
+import random
+import time
+
+import pytest
+from benchmark import VOCABULARY
+from kreuzwort import Layout, Word, Wordlist, lay_out, partition
+
+
+def vocabulary(size: int, seed: int = 0) -> list[str]:
+    """
+    the same words for the same size and seed: classroom words with their
+    letters shuffled, so they cross about as often as real ones do
+    """
+    generator = random.Random(seed)
+    return [
+        "".join(generator.sample(word, len(word)))
+        for word in generator.choices(VOCABULARY, k=size)
+    ]
+
+
+def full_layout(words: list[str]) -> Layout:
+    """every word placed, so that it's not the failures being timed"""
+    layout = lay_out(words, beam_width=1)
+    assert not layout.unplaced
+    return layout
+
+
+def grouped(words: list[str]) -> list[list[Word]]:
+    """the vocabulary sorted into puzzle-sized groups"""
+    return partition(Wordlist(words))
+
+
+def cpu_time(function, repeats: int = 6, budget: float = 1.0) -> float:
+    """
+    fastest of several runs in CPU time. Other processes on a busy machine
+    only ever make a run slower, and don't count towards CPU time at all.
+    Once the budget is used up there are no more repeats, so that a slow
+    regression fails in minutes rather than hours.
+    """
+    fastest = math.inf
+    spent = 0.0
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        elapsed = time.process_time() - start
+        fastest = min(fastest, elapsed)
+        spent += elapsed
+        if spent > budget:
+            break
+    return fastest
+
+
+def growth(sizes: list[int], seconds: list[float]) -> float:
+    """fit seconds = c * size ** k on a log-log scale and return k"""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(second) for second in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum(
+        (x - mean_x) ** 2 for x in xs
+    )
+
+
+@pytest.mark.parametrize(
+    "inputs,expected",
+    [
+        ([1, 2, 4, 8], 1.0),
+        ([1, 4, 16, 64], 2.0),
+    ],
+)
+def test_growth(inputs, expected) -> None:
+    """the fit should recover the exponent of an exact power law"""
+    sizes = [10, 20, 40, 80]
+    assert growth(sizes, inputs) == pytest.approx(expected)
+
+
+@pytest.mark.scaling
+@pytest.mark.parametrize(
+    "sizes,build,bound",
+    [
+        # analysing the words should stay linear
+        ([500, 1000, 2000, 4000, 8000, 16000], Wordlist, 1.4),
+        # every group still looks at every word left, but through bits of
+        # an int, which is close enough to linear at these sizes
+        ([500, 1000, 2000, 4000, 8000, 16000], grouped, 1.5),
+        # each word is tried against every crossing with the words before
+        # it, which is quadratic at most
+        ([50, 100, 200, 400], full_layout, 2.2),
+    ],
+)
+def test_scaling(sizes, build, bound) -> None:
+    """
+    given inputs that double in size, the empirical exponent of the
+    run time shouldn't go over the bound
+    """
+    seconds: list[float] = []
+    for size in sizes:
+        words = vocabulary(size)
+        seconds.append(cpu_time(lambda: build(words)))
+        measured = sizes[: len(seconds)]
+        # no need to wait for the larger sizes if it's clearly too slow
+        if len(seconds) >= 3 and growth(measured, seconds) > bound + 0.5:
+            break
+    assert growth(measured, seconds) <= bound